@@ -1,4 +1,5 @@
 import RPi.GPIO as GPIO
+import logging
 from typing import Callable
     
 class ButtonInterface():
@@ -8,3 +9,32 @@ class ButtonInterface():
         GPIO.setup(self.BUTTON_GPIO, GPIO.IN, pull_up_down=GPIO.PUD_UP)
         GPIO.add_event_detect(self.BUTTON_GPIO, GPIO.FALLING, callback=callback, bouncetime=100)
 
+
+class ButtonPressFilter():
+    """ Ignores the first event of every button (fired when it is set up) and rate limits presses """
+    def __init__(self, buttons: list[str], clock, min_interval: float = 2, skip_first_event: bool = True):
+        self.clock = clock
+        self.min_interval = min_interval
+        self.skip_first_event = skip_first_event
+        self.button_initialized = {str(button): False for button in buttons}
+        self.last_click_timestamp = 0  # initializing the timestamp at the start
+
+    def accept(self, button: str) -> bool:
+        """ True if the press should be forwarded to the backend """
+        if self.skip_first_event and not self.button_initialized.get(str(button)):
+            logging.info(f'Initializing button {str(button)}...')
+            self.button_initialized[str(button)] = True
+            return False
+        elif self.skip_first_event:
+            logging.info(f'Button {str(button)} already initialized')
+
+        current_time = self.clock.time()
+
+        # Check if the difference between the current time and the last click timestamp is more than min_interval
+        if current_time - self.last_click_timestamp >= self.min_interval:
+            logging.info("Pressed button: " + button)
+            # Update the timestamp
+            self.last_click_timestamp = current_time
+            return True
+        logging.info(f"Button pressed too quickly. Please wait for {self.min_interval} seconds between presses.")
+        return False
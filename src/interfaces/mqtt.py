@@ -1,27 +1,54 @@
 import json
+import math
+import asyncio
 from concurrent.futures import Future
+from typing import Callable
 from awsiot import mqtt5_client_builder
 from awscrt import mqtt5
 import logging
 
+from src.utils.recording import TrafficRecorder
+
+async def _wait_for(future: Future, timeout: float):
+    """ Await an awscrt future for at most timeout seconds. On timeout, the future itself is not cancelled:
+    awscrt still completes it on its own thread when the answer arrives late. """
+    return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+
 class MqttClientInterface():
     from src.utils.types import AwsComponentStates, LocalComponentStates, MqttClientOption
     def __init__(self,
                  aws_component_states: AwsComponentStates,
                  local_component_states: LocalComponentStates,
                  client_options: (
-        MqttClientOption), subscription_topic: str):
+        MqttClientOption), subscription_topic: str,
+                 recorder: TrafficRecorder = None,
+                 brightness_callback: Callable[[float], None] = None,
+                 autostart: bool = True):
         """
         aws_component_states (ComponentStates): Global component states of the architecture
-        client_options (MqttClientOption): Configuration for the creation of MQTT5 client
+        client_options (MqttClientOption): Configuration for the creation of MQTT5 client, None to run offline (replay)
         message_topic (str): Filter mask for topics to subscribe to, e.g. "test/topic"
+        recorder (TrafficRecorder): Optional recorder for inbound messages
+        brightness_callback (Callable): Called with the new brightness when a setBrightness message is received
+        autostart (bool): Connect and subscribe right away (blocking), otherwise call connect() or connect_async()
         """
         self.aws_component_states = aws_component_states
         self.local_component_states = local_component_states
         self.subscription_topic = subscription_topic
+        self.recorder = recorder
+        self.brightness_callback = brightness_callback
         self.timeout = 100
         self.future_stopped = Future()
         self.future_connection_success = Future()
+        self.client: mqtt5.Client = None
+        self.client_options = client_options
+        # When set, received packets are handed over (e.g. to the asyncio runtime) instead of being processed
+        # on the awscrt callback thread
+        self.message_dispatcher: Callable[[mqtt5.PublishPacket], None] = None
+
+        if client_options is None:
+            logging.info("MQTT5 Client running offline, no connection is made")
+            return
 
         # Create MQTT5 client
         self.client: mqtt5.Client = mqtt5_client_builder.mtls_from_path(
@@ -37,24 +64,46 @@ class MqttClientInterface():
         )
         logging.info("MQTT5 Client Created")
 
-        logging.info(f"Connecting to {client_options.endpoint} with client ID '{client_options.client_id}'...")
+        if autostart:
+            self.connect()
+
+    def _start(self) -> Future:
+        logging.info(f"Connecting to {self.client_options.endpoint} with client ID '{self.client_options.client_id}'...")
         self.client.start()
+        return self.future_connection_success
 
-        # Wait for connection to be successful
-        lifecycle_connect_success_data = self.future_connection_success.result(self.timeout)
+    def _on_connected(self, lifecycle_connect_success_data: mqtt5.LifecycleConnectSuccessData):
         connack_packet = lifecycle_connect_success_data.connack_packet
-        logging.info(f"Connected to endpoint: {client_options.endpoint} with client ID '{client_options.client_id}' with reason_code:{repr(connack_packet.reason_code)}")
+        logging.info(f"Connected to endpoint: {self.client_options.endpoint} with client ID '{self.client_options.client_id}' with reason_code:{repr(connack_packet.reason_code)}")
 
-        # Subscribe to the topic
+    def _subscribe(self) -> Future:
         logging.info(f"Subscribing to topic '{self.subscription_topic}'...")
-        subscribe_future = self.client.subscribe(subscribe_packet=mqtt5.SubscribePacket(
+        return self.client.subscribe(subscribe_packet=mqtt5.SubscribePacket(
             subscriptions=[mqtt5.Subscription(
                 topic_filter=self.subscription_topic,
                 qos=mqtt5.QoS.AT_LEAST_ONCE)]
         ))
-        suback = subscribe_future.result(self.timeout)
+
+    def connect(self):
+        """ Start the client, wait for the connection and subscribe to the topic """
+        if not self.client:
+            return
+        # Wait for connection to be successful
+        self._on_connected(self._start().result(self.timeout))
+
+        # Subscribe to the topic
+        suback = self._subscribe().result(self.timeout)
+        logging.info("Subscribed with {}".format(suback.reason_codes))
+
+    async def connect_async(self, timeout: float = None):
+        """ Same as connect(), awaiting the awscrt futures in the event loop instead of blocking """
+        if not self.client:
+            return
+        timeout = timeout or self.timeout
+        self._on_connected(await _wait_for(self._start(), timeout))
+        suback = await _wait_for(self._subscribe(), timeout)
         logging.info("Subscribed with {}".format(suback.reason_codes))
-        
+
     # Callback for the lifecycle event Connection Success
     def _on_lifecycle_connection_success(self, lifecycle_connect_success_data: mqtt5.LifecycleConnectSuccessData):
         logging.info("Lifecycle Connection Success")
@@ -71,7 +120,15 @@ class MqttClientInterface():
         publish_packet = publish_packet_data.publish_packet
         assert isinstance(publish_packet, mqtt5.PublishPacket)
         logging.info(f"Received message from topic {publish_packet.topic}: {publish_packet.payload}")
-        
+        if self.recorder:
+            self.recorder.record(publish_packet.topic, publish_packet.payload)
+        if self.message_dispatcher:
+            self.message_dispatcher(publish_packet)
+        else:
+            self.handle_publish_packet(publish_packet)
+
+    def handle_publish_packet(self, publish_packet: mqtt5.PublishPacket):
+        """ Apply a received message to the component states """
         # We expect messages in the following format:
         # {
         #     "deployment": "<green|red>",
@@ -85,6 +142,20 @@ class MqttClientInterface():
             return
 
         payload = json.loads(publish_packet.payload)
+
+        # Brightness can be changed at runtime with {"type": "setBrightness", "brightness": <0.0 - 1.0>}
+        if payload.get("type") == "setBrightness":
+            if self.brightness_callback and payload.get("brightness") is not None:
+                try:
+                    brightness = float(payload.get("brightness"))
+                except (TypeError, ValueError):
+                    brightness = math.nan
+                if not math.isfinite(brightness):
+                    logging.warning(f"Ignoring setBrightness with invalid brightness: {payload.get('brightness')}")
+                    return
+                self.brightness_callback(brightness)
+            return
+
         component = payload.get("component")
         deployment = payload.get("deployment")
         status = payload.get("status")
@@ -95,35 +166,82 @@ class MqttClientInterface():
             if aws_component_state:
                 aws_component_state.deployment = deployment
                 aws_component_state.state = status
-                self.aws_component_states.updateComponentState(component_id=component, aws_component_state=aws_component_state)
 
                 #trigger update on local component
                 local_component = self.local_component_states.getComponentState(component)
                 local_component.update(aws_component_state)
 
+                # Updated last, as it bumps the version readers of the states rely on
+                self.aws_component_states.updateComponentState(component_id=component, aws_component_state=aws_component_state)
+
     # Callback for the lifecycle event Stopped
     def _on_lifecycle_stopped(self, lifecycle_stopped_data: mqtt5.LifecycleStoppedData):
         logging.info("Lifecycle Stopped")
-        self.future_stopped.set_result(lifecycle_stopped_data)
+        if not self.future_stopped.done():
+            self.future_stopped.set_result(lifecycle_stopped_data)
 
-    def cleanup(self):
-        """ Remove subscription and stop the client """
+    def _unsubscribe(self) -> Future:
         logging.info(f"Unsubscribing from topic {self.subscription_topic}")
-        unsubscribe_future = self.client.unsubscribe(unsubscribe_packet=mqtt5.UnsubscribePacket(
+        return self.client.unsubscribe(unsubscribe_packet=mqtt5.UnsubscribePacket(
             topic_filters=[self.subscription_topic]))
-        unsuback = unsubscribe_future.result(self.timeout)
-        logging.info(f"Unsubscribed from topic {self.subscription_topic} with {unsuback.reason_codes}")
+
+    def _stop(self) -> Future:
         logging.info("Stopping Client")
         self.client.stop()
-        self.future_stopped.result(self.timeout)
-        logging.info("Client Stopped!")
+        return self.future_stopped
 
-    def publish_message(self, topic: str, message: str):
+    def cleanup(self):
+        """ Remove subscription and stop the client """
+        try:
+            if not self.client:
+                return
+            unsuback = self._unsubscribe().result(self.timeout)
+            logging.info(f"Unsubscribed from topic {self.subscription_topic} with {unsuback.reason_codes}")
+            self._stop().result(self.timeout)
+            logging.info("Client Stopped!")
+        finally:
+            # Closed last, messages keep arriving until the client is stopped
+            if self.recorder:
+                self.recorder.close()
+
+    async def cleanup_async(self, timeout: float = None):
+        """ Same as cleanup(), awaiting the awscrt futures in the event loop, each at most timeout seconds """
+        try:
+            if not self.client:
+                return
+            timeout = timeout or self.timeout
+            # The client is stopped even if unsubscribing fails, e.g. when the broker doesn't answer
+            try:
+                unsuback = await _wait_for(self._unsubscribe(), timeout)
+                logging.info(f"Unsubscribed from topic {self.subscription_topic} with {unsuback.reason_codes}")
+            except Exception as error:
+                logging.warning(f"Unsubscribing from topic {self.subscription_topic} failed: {error!r}")
+            await _wait_for(self._stop(), timeout)
+            logging.info("Client Stopped!")
+        finally:
+            # Closed last, messages keep arriving until the client is stopped
+            if self.recorder:
+                self.recorder.close()
+
+    def _publish(self, topic: str, message: str) -> Future:
         logging.info(f"Publishing message to topic '{topic}': {message}")
-        publish_future = self.client.publish(mqtt5.PublishPacket(
+        return self.client.publish(mqtt5.PublishPacket(
             topic=topic,
             payload=json.dumps(message),
             qos=mqtt5.QoS.AT_LEAST_ONCE
         ))
-        publish_completion_data = publish_future.result(self.timeout)
-        logging.info(f"PubAck received with {repr(publish_completion_data.puback.reason_code)}")
\ No newline at end of file
+
+    def publish_message(self, topic: str, message: str):
+        if not self.client:
+            logging.info(f"MQTT5 Client is offline, message to topic '{topic}' not published: {message}")
+            return
+        publish_completion_data = self._publish(topic, message).result(self.timeout)
+        logging.info(f"PubAck received with {repr(publish_completion_data.puback.reason_code)}")
+
+    async def publish_message_async(self, topic: str, message: str, timeout: float = None):
+        """ Same as publish_message(), awaiting the PubAck in the event loop instead of blocking """
+        if not self.client:
+            logging.info(f"MQTT5 Client is offline, message to topic '{topic}' not published: {message}")
+            return
+        publish_completion_data = await _wait_for(self._publish(topic, message), timeout or self.timeout)
+        logging.info(f"PubAck received with {repr(publish_completion_data.puback.reason_code)}")
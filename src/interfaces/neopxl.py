@@ -1,17 +1,22 @@
-import time
 import sys
 import logging
-import math
 
 if sys.argv and len(sys.argv) > 1 and sys.argv[1] == "--mock":
     import src.mock.neopixel as neopixel  # use for non-Raspi testing
+    from src.mock.neopixel import neopixel_write
 else:
     import neopixel # use for Raspi
+    from neopixel_write import neopixel_write
 
-import math
 from enum import Enum
+from operator import itemgetter
+from typing import List
 
-from src.utils.types import Action
+from src.utils.types import Action, EffectAction
+from src.utils.clock import SystemClock
+from src.utils.effects import FrameCache, frame_at
+from src.utils.color import build_lut
+from src.utils.layout import PixelMap, StripLayout
 
 class IntensityWheelValues(Enum):
     ON = 250
@@ -32,103 +37,105 @@ class IntensityWheelValues(Enum):
     OFF = 1
     OFF2 = 0
     
-class NeopixelInterface():
-    def __init__(self, port: int, nb_pixels: int):
-        self.port = port
-        self.nb_pixels = nb_pixels
+class _StripOutput():
+    """ Output stage of one stripe: its slice of the framebuffer and the last bytes pushed to it """
+    def __init__(self, strip: StripLayout):
+        self.strip = strip
+        self.start = strip.offset * 3
+        self.stop = (strip.offset + strip.nb_pixels) * 3
         # The order of the pixel colors - RGB or GRB. Some NeoPixels have red and green reversed!
-        # For RGBW NeoPixels, simply change the ORDER to RGBW or GRBW.
-        self.neopixel_client: neopixel.NeoPixel = neopixel.NeoPixel(port, nb_pixels, brightness=1, auto_write=False, pixel_order=neopixel.GRB)
-        self.int_values = [intensity.value * 0.05 for intensity in IntensityWheelValues] 
-        self.len_int_values = len(self.int_values)
-        self.max_pulse_value = 255
-        self.min_pulse_value = 50
-        self.current_cycle_step = 0
-        self.cycle_length = 100
-        self.amplitude = (self.max_pulse_value - self.min_pulse_value) / 2
-        self.offset = (self.max_pulse_value + self.min_pulse_value) / 2
-        self.current_intensity = int(self.amplitude * math.sin(2 * math.pi * self.current_cycle_step / self.cycle_length) + self.offset)
-        self.action_methods = {
-            Action.OFF: self._off,
-            Action.RED: self._red,
-            Action.ORANGE: self._orange,
-            Action.GREEN: self._green,
-            Action.WHITE: self._white,
-            Action.RUNNING_LIGHT: self._running_lights
-        }
-
-    def _off(self, pixels):
-        for pixel in pixels:
-            self.neopixel_client[pixel] = (10, 0, 0)
-
-    def _red(self, pixels):
-        for pixel in pixels:
-            self.neopixel_client[pixel] = (255, 0, 0)
-
-    def _orange(self, pixels):
-        for pixel in pixels:
-            self.neopixel_client[pixel] = (100, 255, 0)
-
-    def _green(self, pixels):
-        for pixel in pixels:
-            self.neopixel_client[pixel] = (0, 255, 0)
-
-    def _white(self, pixels):
-        for pixel in pixels:
-            self.neopixel_client[pixel] = (255, 255, 255)
+        # Brightness stays at 1 in the driver, dimming is done by the lookup table of NeopixelInterface.
+        self.neopixel_client: neopixel.NeoPixel = neopixel.NeoPixel(
+            strip.pin, strip.nb_pixels, brightness=1, auto_write=False, pixel_order=strip.pixel_order)
+        # Reorders (r, g, b) bytes of the stripe into the byte order sent on the wire
+        self.wire_order = None
+        if strip.pixel_order != "RGB":
+            self.wire_order = itemgetter(*[pixel * 3 + "RGB".index(color)
+                                           for pixel in range(strip.nb_pixels) for color in strip.pixel_order])
+        self.pushed = None
+        # Bytes on the wire, always the same object: the Raspi driver re-initialises itself for every new buffer
+        self.buffer = bytearray(strip.nb_pixels * 3)
+
+    def push(self, frame: bytes):
+        """ Send the stripe's part of a frame, if it changed since the last push """
+        output = frame[self.start:self.stop]
+        if output == self.pushed:
+            return
+        self.pushed = output
+        self.buffer[:] = self.wire_order(output) if self.wire_order else output
+        neopixel_write(self.neopixel_client.pin, self.buffer)
 
-    def _running_lights(self, pixels):
-        # Explicit brightness levels for white color
-        brightness_levels = [
-            (255, 255, 255),  # Full brightness
-            (128, 128, 128),  # 50% brightness
-            (64, 64, 64),     # 25% brightness
-            (25, 25, 25)      # 10% brightness
-        ]
-    
-        c_time = time.time()
-        tail_length = len(brightness_levels)  # Length of the tail (4 pixels)
-
-        # Calculate the current "head" position on the ring
-        head_position = int(c_time * 10) % len(pixels)  # Speed up by increasing the multiplier
-
-        # Iterate over all pixels
-        for i in range(len(pixels)):
-            # Calculate the distance of the current pixel from the head position
-            distance = (i - head_position) % len(pixels)
-        
-            if distance < tail_length:
-                # Use the pre-defined brightness levels
-                adjusted_color = brightness_levels[distance]
-                self.neopixel_client[pixels[i]] = adjusted_color
-            else:
-                # Turn off the pixel if it's not in the tail
-                self.neopixel_client[pixels[i]] = (0, 0, 0)
-
-        # Show the changes after updating all pixels
-        self.neopixel_client.show()
+class NeopixelInterface():
+    def __init__(self, strips: List[StripLayout], clock = None, frame_cache_max_bytes: int = 1024 * 1024,
+                 gamma: float = 1.0, brightness: float = 1.0):
+        self.nb_pixels = sum(strip.nb_pixels for strip in strips)
+        # Clock driving all animations, injectable for deterministic replays
+        self.clock = clock or SystemClock()
+        # One output per stripe, each pushed separately
+        self.outputs = [_StripOutput(strip) for strip in strips]
+        # Rendered (r, g, b) bytes of all pixels of all stripes, pushed in show_changes
+        self.framebuffer = bytearray(self.nb_pixels * 3)
+        self.shown_frame = None
+        # Gamma x brightness lookup table, applied to the whole framebuffer in one pass
+        self.gamma = gamma
+        self.brightness = brightness
+        self.lut = build_lut(gamma, brightness)
+        # (version, frame) of the last frame pushed to the stripes, replaced as a whole so readers need no lock
+        self.published_frame = (0, bytes(self.framebuffer))
+        # Notified after every published frame when set, e.g. by StatusInterface to wake up long-polling requests
+        self.changed = None
+        # Rendered frame sequences of effects, replayed instead of recomputing them every frame
+        self.frame_cache = FrameCache(frame_cache_max_bytes)
+        # Effects used for the predefined actions, see src/utils/effects.py
+        self.action_effects = {
+            Action.OFF: EffectAction.create('solid', color=(10, 0, 0)),
+            Action.RED: EffectAction.create('solid', color=(255, 0, 0)),
+            Action.ORANGE: EffectAction.create('solid', color=(100, 255, 0)),
+            Action.GREEN: EffectAction.create('solid', color=(0, 255, 0)),
+            Action.WHITE: EffectAction.create('solid', color=(255, 255, 255)),
+            Action.RUNNING_LIGHT: EffectAction.create('chase')
+        }
 
-    def update_pixels(self, pixels: list[int], action: Action):
-        logging.debug(f"Updating pixels {pixels} with action: {action}")
-        """ Update pixels given action, but only if we're not in MOCK mode """
-        if not (sys.argv and len(sys.argv) > 1 and sys.argv[1] == "--mock"):
-            method = self.action_methods.get(action)
-            if method: #
-                method(pixels)
-            else:
-                raise(f"ERROR: Unknown action: {action}. Please implement first!")
-        else:
-            logging.debug("Mock mode, not updating pixels.")
+    def update_pixels(self, pixels: PixelMap, action):
+        """ Update pixels given an Action or EffectAction """
+        logging.debug(f"Updating {len(pixels)} pixels with action: {action}")
+        if not len(pixels):
+            return
+        effect_action = self.action_effects.get(action) if isinstance(action, Action) else action
+        if not effect_action:
+            raise ValueError(f"ERROR: Unknown action: {action}. Please implement first!")
+        frames, fps = self.frame_cache.get(effect_action, len(pixels))
+        pixels.write(self.framebuffer, frame_at(frames, fps, self.clock.time()))
+
+    def set_brightness(self, brightness: float):
+        """ Change the global brightness, takes effect with the next frame """
+        logging.info(f"Neopixel: Setting brightness to {brightness}")
+        self.brightness = min(max(brightness, 0.0), 1.0)
+        self.lut = build_lut(self.gamma, self.brightness)
+        # Force the next frame to be pushed, even if the framebuffer didn't change
+        self.shown_frame = None
 
     def show_changes(self):
         logging.debug("Neopixel: Showing changes.")
         """ Move changes to the actual hardware """
-        self.neopixel_client.show()
-        self.current_cycle_step = self.current_cycle_step + 1
-        if self.current_cycle_step == self.cycle_length - 1:
-            self.current_cycle_step = 0
-        self.current_intensity = int(self.amplitude * math.sin(2 * math.pi * self.current_cycle_step / self.cycle_length) + self.offset)
+        if self.framebuffer == self.shown_frame:
+            return
+        self.shown_frame = bytes(self.framebuffer)
+        frame = self.shown_frame.translate(self.lut)
+        for output in self.outputs:
+            output.push(frame)
+        self.published_frame = (self.published_frame[0] + 1, frame)
+        if self.changed:
+            self.changed.notify()
+
+    def frame(self) -> bytes:
+        """ (r, g, b) bytes of the frame shown on all stripes, after gamma and brightness """
+        return self.published_frame[1]
+
+    def metrics(self) -> dict:
+        return {"frame_cache": self.frame_cache.stats(), "brightness": self.brightness}
 
     def cleanup(self):
         """ Celan up """
-        self.neopixel_client.deinit()
+        for output in self.outputs:
+            output.neopixel_client.deinit()
@@ -0,0 +1,149 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from src.utils.notify import ChangeNotifier
+from src.utils.types import Action, AwsComponentStates, ComponentIds, LocalComponentStates
+
+class StatusInterface():
+    """ Read-only HTTP endpoint serving the pipeline state and the current LED frame.
+
+    GET /status  JSON with the AWS component states, the action per component and the frame as hex
+    GET /frame   Raw (r, g, b) bytes of the frame shown on the stripe
+
+    Responses are serialised once per state / frame version and reused for every poller. Clients
+    can send `If-None-Match` with the last ETag and `?wait=<seconds>` to long-poll for a change.
+    The render loop is never blocked: versions are plain counters and the frame is published as an
+    immutable (version, bytes) tuple, so this side only reads references. Long-polling requests sleep
+    on a ChangeNotifier that the render loop and MQTT updates only ever set.
+    """
+    def __init__(self,
+                 aws_component_states: AwsComponentStates,
+                 local_component_states: LocalComponentStates,
+                 neopixel_client,
+                 host: str,
+                 port: int,
+                 max_wait: float = 30):
+        self.aws_component_states = aws_component_states
+        self.local_component_states = local_component_states
+        self.neopixel_client = neopixel_client
+        self.max_wait = max_wait
+        # Shared by state updates and published frames, so a long-poll waits on a single event
+        self.changed = ChangeNotifier()
+        aws_component_states.changed = self.changed
+        neopixel_client.changed = self.changed
+        # (key, etag, body) of the last serialised snapshot per path
+        self.snapshots = {}
+        self.server = ThreadingHTTPServer((host, port), _StatusRequestHandler)
+        self.server.daemon_threads = True
+        self.server.status_interface = self
+        self.thread = threading.Thread(target=self.server.serve_forever, name="status-server", daemon=True)
+
+    def start(self):
+        logging.info(f"Serving status on http://{self.server.server_address[0]}:{self.server.server_address[1]}/status")
+        self.thread.start()
+
+    def _versions(self, path: str) -> tuple:
+        frame_version = self.neopixel_client.published_frame[0]
+        if path == "/frame":
+            return (frame_version,)
+        return (self.aws_component_states.version, frame_version)
+
+    def _serialise(self, path: str) -> bytes:
+        frame_version, frame = self.neopixel_client.published_frame
+        if path == "/frame":
+            return frame
+        components = {}
+        for component_id in ComponentIds:
+            aws_component_state = self.aws_component_states.getComponentState(component_id)
+            local_component = self.local_component_states.getComponentState(component_id)
+            components[component_id.value] = {
+                "deployment": aws_component_state.deployment,
+                "state": aws_component_state.state,
+                "action": _action_to_json(local_component.currentAction()),
+            }
+        return json.dumps({
+            "state_version": self.aws_component_states.version,
+            "frame_version": frame_version,
+            "components": components,
+            "frame": frame.hex(),
+        }).encode("utf-8")
+
+    def snapshot(self, path: str) -> tuple:
+        """ Returns (etag, body), serialising only when the versions changed since the last call """
+        # Versions are read before serialising, so a change during serialisation leads to a rebuild next time
+        key = self._versions(path)
+        snapshot = self.snapshots.get(path)
+        if snapshot is None or snapshot[0] != key:
+            etag = '"' + "-".join(str(version) for version in key) + '"'
+            snapshot = (key, etag, self._serialise(path))
+            self.snapshots[path] = snapshot
+        return snapshot[1], snapshot[2]
+
+    def wait_for_change(self, path: str, etag: str, wait: float) -> tuple:
+        """ Long-poll until the snapshot differs from etag or wait seconds passed """
+        deadline = time.monotonic() + min(wait, self.max_wait)
+        while True:
+            # Taken before the snapshot, so a change in between still wakes us up
+            event = self.changed.event
+            current_etag, body = self.snapshot(path)
+            remaining = deadline - time.monotonic()
+            if current_etag != etag or remaining <= 0:
+                return current_etag, body
+            event.wait(remaining)
+
+    def cleanup(self):
+        """ Stop serving """
+        self.server.shutdown()
+        self.server.server_close()
+
+def _action_to_json(action):
+    if action is None:
+        return None
+    if isinstance(action, Action):
+        return action.name
+    return {"effect": action.name, "params": dict(action.params)}
+
+class _StatusRequestHandler(BaseHTTPRequestHandler):
+    content_types = {
+        "/status": "application/json",
+        "/frame": "application/octet-stream",
+    }
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        content_type = self.content_types.get(url.path)
+        if not content_type:
+            self.send_error(404)
+            return
+        status_interface: StatusInterface = self.server.status_interface
+        etag = self.headers.get("If-None-Match")
+        try:
+            wait = float(parse_qs(url.query).get("wait", ["0"])[0])
+        except ValueError:
+            self.send_error(400, "wait must be a number of seconds")
+            return
+
+        if etag and wait > 0:
+            current_etag, body = status_interface.wait_for_change(url.path, etag, wait)
+        else:
+            current_etag, body = status_interface.snapshot(url.path)
+
+        if etag == current_etag:
+            self.send_response(304)
+            self.send_header("ETag", current_etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", current_etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug("Status request: " + format % args)
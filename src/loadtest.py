@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+""" Measure latency of the asyncio runtime under concurrent button presses and message bursts.
+
+Usage: python3 -m src.loadtest --mock [--duration 5] [--button-threads 4] [--presses 50]
+                                      [--message-threads 4] [--burst 200] [--publish-latency 0.02]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+# Check if we have to activate MOCK mode
+if sys.argv and len(sys.argv) > 1 and sys.argv[1] == "--mock":
+    import fake_rpi
+    sys.modules['RPi'] = fake_rpi.RPi     # Fake RPi
+    sys.modules['RPi.GPIO'] = fake_rpi.RPi.GPIO # Fake GPIO
+
+from awscrt import mqtt5
+
+import src.interfaces.button as button_interface
+import src.interfaces.mqtt as mqtt_interface
+import src.interfaces.neopxl as neopixel_interface
+import src.utils.constants as constants
+import src.utils.types as types
+from src.utils.clock import SystemClock
+from src.utils.layout import load_layout
+from src.utils.runtime import AsyncRuntime
+
+logging.basicConfig(level=logging.WARNING)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the asyncio runtime with the mock stack")
+    parser.add_argument("--mock", action="store_true", help="use the mock NeoPixel driver and GPIO (must be the first argument)")
+    parser.add_argument("--duration", type=float, default=5, help="seconds to run")
+    parser.add_argument("--button-threads", type=int, default=4, help="threads pressing buttons concurrently, like GPIO callbacks")
+    parser.add_argument("--presses", type=int, default=50, help="presses per button thread")
+    parser.add_argument("--message-threads", type=int, default=4, help="threads publishing messages, like awscrt callbacks")
+    parser.add_argument("--burst", type=int, default=200, help="messages per burst and message thread")
+    parser.add_argument("--publish-latency", type=float, default=0.02, help="simulated seconds until a PubAck is received")
+    parser.add_argument("--layout", default=constants.LAYOUT_FILEPATH, help="layout file to render with")
+    return parser.parse_args()
+
+class _DelayedPubackClient():
+    """ Stands in for the awscrt client: publish() returns a Future completed with a PubAck from a timer thread """
+    def __init__(self, publish_latency: float):
+        self.publish_latency = publish_latency
+
+    def publish(self, publish_packet: mqtt5.PublishPacket) -> Future:
+        future = Future()
+        threading.Timer(self.publish_latency, future.set_result, [mqtt5.PublishCompletionData(
+            puback=mqtt5.PubackPacket(reason_code=mqtt5.PubackReasonCode.SUCCESS))]).start()
+        return future
+
+def press_buttons(runtime: AsyncRuntime, presses: int, stop: threading.Event):
+    buttons = [types.Buttons.DEPLOY_GREEN, types.Buttons.DEPLOY_RED,
+               types.Buttons.ENABLE_DISABLE_REGION1, types.Buttons.ENABLE_DISABLE_REGION2]
+    for _ in range(presses):
+        if stop.is_set():
+            return
+        runtime.post_button(random.choice(buttons))
+        time.sleep(random.uniform(0, 0.02))
+
+def publish_bursts(mqtt_client: mqtt_interface.MqttClientInterface, burst: int, stop: threading.Event):
+    components = [component_id.value for component_id in types.ComponentIds]
+    states = [types.State.PROCESSING, types.State.SUCCESSFUL, types.State.FAILED, types.State.ENABLED]
+    while not stop.is_set():
+        for _ in range(burst):
+            payload = json.dumps({
+                "deployment": random.choice([types.Deployment.GREEN, types.Deployment.RED]),
+                "component": random.choice(components),
+                "status": random.choice(states)})
+            # Same entry point awscrt calls on its callback thread
+            mqtt_client._on_publish_received(mqtt5.PublishReceivedData(
+                publish_packet=mqtt5.PublishPacket(topic=constants.MQTT_CLIENT_SUBSCRIPTION_TOPIC, payload=payload.encode("utf-8"))))
+        stop.wait(0.5)
+
+def run(args) -> dict:
+    clock = SystemClock()
+    layout = load_layout(args.layout)
+    neopixel_client = neopixel_interface.NeopixelInterface(
+        strips=layout.strips,
+        clock=clock,
+        frame_cache_max_bytes=constants.EFFECT_FRAME_CACHE_MAX_BYTES,
+        gamma=constants.NEOPIXEL_GAMMA,
+        brightness=constants.NEOPIXEL_BRIGHTNESS)
+    local_component_states = types.LocalComponentStates.fromLayout(neopixel_client, layout)
+    aws_component_states = types.AwsComponentStates(
+        **{component_id.value: types.AwsComponentState() for component_id in types.ComponentIds})
+    mqtt_client = mqtt_interface.MqttClientInterface(
+        aws_component_states,
+        local_component_states,
+        None,
+        constants.MQTT_CLIENT_SUBSCRIPTION_TOPIC)
+    # Button presses are published like with the real client, only the PubAck is simulated
+    mqtt_client.client = _DelayedPubackClient(args.publish_latency)
+    # No rate limiting, so every press goes through the full publish path
+    button_press_filter = button_interface.ButtonPressFilter([], clock, min_interval=0, skip_first_event=False)
+
+    def render_frame():
+        for local_component in local_component_states.getAllComponentStates():
+            local_component.updatePixels()
+        neopixel_client.show_changes()
+
+    async def handle_button(button):
+        # Same as handle_button_pressed of main.py
+        if button_press_filter.accept(button):
+            await mqtt_client.publish_message_async(
+                constants.MQTT_CLIENT_PUBLISHING_TOPIC,
+                constants.MQTT_CLIENT_PUBLISHING_MESSAGE_PRESSED.replace("__button__", button),
+                constants.RUNTIME_MQTT_TIMEOUT)
+
+    runtime = AsyncRuntime(
+        render_frame=render_frame,
+        handle_message=mqtt_client.handle_publish_packet,
+        handle_button=handle_button,
+        frame_interval=constants.FRAME_INTERVAL,
+        queue_size=constants.RUNTIME_QUEUE_SIZE,
+        shutdown_timeout=constants.RUNTIME_SHUTDOWN_TIMEOUT)
+    mqtt_client.message_dispatcher = runtime.post_message
+
+    stop = threading.Event()
+    threads = [threading.Thread(target=press_buttons, args=(runtime, args.presses, stop), daemon=True)
+               for _ in range(args.button_threads)]
+    threads += [threading.Thread(target=publish_bursts, args=(mqtt_client, args.burst, stop), daemon=True)
+                for _ in range(args.message_threads)]
+
+    async def startup():
+        for thread in threads:
+            thread.start()
+        await asyncio.sleep(args.duration)
+        stop.set()
+        runtime.request_stop()
+
+    asyncio.run(runtime.run(startup, [("stripes", neopixel_client.cleanup)]))
+    return {**runtime.metrics(), **neopixel_client.metrics()}
+
+if __name__ == "__main__":
+    summary = run(parse_args())
+    # Only the summary is logged at INFO, the load itself would flood the log
+    logging.getLogger().setLevel(logging.INFO)
+    for key, value in summary.items():
+        logging.info(f"{key}: {value}")
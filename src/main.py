@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
+import asyncio
 import signal
 import sys
-import time
 import logging
 
 # Check if we have to activate MOCK mode
@@ -15,54 +15,55 @@ import RPi.GPIO as GPIO
 import src.interfaces.button as button_interface
 import src.interfaces.mqtt as mqtt_interface
 import src.interfaces.neopxl as neopixel_interface
+import src.interfaces.status as status_interface
 import src.utils.constants as constants
 import src.utils.types as types
+from src.utils.clock import SystemClock
+from src.utils.color import BrightnessSchedule
+from src.utils.layout import load_layout
+from src.utils.recording import TrafficRecorder
+from src.utils.runtime import AsyncRuntime
 
 logging.basicConfig(level=constants.LOG_LEVEL)
 
+# Run MQTT, buttons and rendering on an asyncio event loop instead of callback threads and a busy loop
+use_asyncio_runtime = "--asyncio" in sys.argv
+
 def create_signal_handler(
         mqtt_client: mqtt_interface.MqttClientInterface,
-        neopixel_client: neopixel_interface.NeopixelInterface):
+        neopixel_client: neopixel_interface.NeopixelInterface,
+        status_client: status_interface.StatusInterface = None,
+        runtime: AsyncRuntime = None):
     """ Wrapper to provide signal_handler with references to objects needed to be shut down. """
     def signal_handler(sig, frame):
         """ Called when Ctl + C is pressed """
+        if runtime:
+            # The runtime cancels its tasks and shuts everything down with bounded timeouts
+            runtime.request_stop()
+            return
+        if status_client:
+            status_client.cleanup()
         mqtt_client.cleanup()
         neopixel_client.cleanup()
         GPIO.cleanup()
         sys.exit(0)
     return signal_handler
 
-button_initialized = {
-    str(types.Buttons.DEPLOY_GREEN): False,
-    str(types.Buttons.DEPLOY_RED): False,
-    str(types.Buttons.ENABLE_DISABLE_REGION1): False,
-    str(types.Buttons.ENABLE_DISABLE_REGION2): False
-}
-
 def on_button_clicked_callback(button):
-    global last_click_timestamp
-    global button_initialized
-
-    if not button_initialized.get(str(button)):
-        logging.info(f'Initializing button {str(button)}...')
-        button_initialized[str(button)] = True
-        return
-    else:
-        logging.info(f'Button {str(button)} already initialized')
-
-    current_time = time.time()
-
-    # Check if the difference between the current time and the last click timestamp is more than 10 seconds
-    if current_time - last_click_timestamp >= 2:
-        logging.info("Pressed button: " + button)
+    if runtime:
+        runtime.post_button(button)
+    elif button_press_filter.accept(button):
         mqtt_client.publish_message(
             constants.MQTT_CLIENT_PUBLISHING_TOPIC,
             constants.MQTT_CLIENT_PUBLISHING_MESSAGE_PRESSED.replace("__button__", button))
 
-        # Update the timestamp
-        last_click_timestamp = current_time
-    else:
-        logging.info("Button pressed too quickly. Please wait for 2 seconds between presses.")
+async def handle_button_pressed(button):
+    """ Button handling of the asyncio runtime, awaits the PubAck instead of blocking """
+    if button_press_filter.accept(button):
+        await mqtt_client.publish_message_async(
+            constants.MQTT_CLIENT_PUBLISHING_TOPIC,
+            constants.MQTT_CLIENT_PUBLISHING_MESSAGE_PRESSED.replace("__button__", button),
+            constants.RUNTIME_MQTT_TIMEOUT)
 
 def on_button_clicked_callback_green(value):
     on_button_clicked_callback(types.Buttons.DEPLOY_GREEN)
@@ -76,63 +77,29 @@ def on_button_clicked_callback_disableregion1(value):
 def on_button_clicked_callback_disableregion2(value):
     on_button_clicked_callback(types.Buttons.ENABLE_DISABLE_REGION2)
 
-last_click_timestamp = 0  # initializing the timestamp at the start
-
-neopixel_client: neopixel_interface.NeopixelInterface = neopixel_interface.NeopixelInterface(
-    port=constants.NEOPIXEL_PORT,
-    nb_pixels=constants.NEOPIXEL_NB_PIXELS)
-
-repo_component : types.LocalComponent = types.LocalComponent(
-    neopixel_client = neopixel_client,
-    state_id = types.ComponentIds.repo,
-    pixels = constants.COMPONENT_PIXELS.get(types.ComponentIds.repo),
-)
+# Single clock shared by animations and button rate limiting
+clock = SystemClock()
 
-build_component : types.LocalComponent = types.LocalComponent(
-    neopixel_client = neopixel_client,
-    state_id = types.ComponentIds.build,
-    pixels = constants.COMPONENT_PIXELS.get(types.ComponentIds.build),
-)
+button_press_filter = button_interface.ButtonPressFilter(
+    [types.Buttons.DEPLOY_GREEN, types.Buttons.DEPLOY_RED,
+     types.Buttons.ENABLE_DISABLE_REGION1, types.Buttons.ENABLE_DISABLE_REGION2],
+    clock)
 
-qa_component : types.LocalComponent = types.LocalComponent(
-    neopixel_client = neopixel_client,
-    state_id = types.ComponentIds.qa,
-    pixels = constants.COMPONENT_PIXELS.get(types.ComponentIds.qa),
-)
-
-transitionRegion1_component : types.LocalComponent = types.LocalComponent(
-    neopixel_client = neopixel_client,
-    state_id = types.ComponentIds.transitionRegion1,
-    pixels = constants.COMPONENT_PIXELS.get(types.ComponentIds.transitionRegion1),
-)
+# Stripes and component pixels, compiled into flat pixel maps once at startup
+layout = load_layout(constants.LAYOUT_FILEPATH)
 
-region1_component : types.LocalComponent = types.LocalComponent(
-    neopixel_client = neopixel_client,
-    state_id = types.ComponentIds.region1,
-    pixels = constants.COMPONENT_PIXELS.get(types.ComponentIds.region1),
-)
+neopixel_client: neopixel_interface.NeopixelInterface = neopixel_interface.NeopixelInterface(
+    strips=layout.strips,
+    clock=clock,
+    frame_cache_max_bytes=constants.EFFECT_FRAME_CACHE_MAX_BYTES,
+    gamma=constants.NEOPIXEL_GAMMA,
+    brightness=constants.NEOPIXEL_BRIGHTNESS)
 
-transitionRegion2_component : types.LocalComponent = types.LocalComponent(
-    neopixel_client = neopixel_client,
-    state_id = types.ComponentIds.transitionRegion2,
-    pixels = constants.COMPONENT_PIXELS.get(types.ComponentIds.transitionRegion2),
-)
+brightness_schedule = BrightnessSchedule(constants.NEOPIXEL_BRIGHTNESS_SCHEDULE, clock)
 
-region2_component : types.LocalComponent = types.LocalComponent(
-    neopixel_client = neopixel_client,
-    state_id = types.ComponentIds.region2,
-    pixels = constants.COMPONENT_PIXELS.get(types.ComponentIds.region2),
-)
-
-local_component_states = types.LocalComponentStates(
-    repo = repo_component,
-    build = build_component,
-    qa = qa_component,
-    transitionRegion1 = transitionRegion1_component,
-    region1 = region1_component,
-    transitionRegion2 = transitionRegion2_component,
-    region2 = region2_component
-)
+# One component per ComponentId with the default actions. To customise actions of a component, set them on
+# the component afterwards, e.g. local_component_states.repo.failed_action_red = types.Action.ORANGE
+local_component_states = types.LocalComponentStates.fromLayout(neopixel_client, layout)
 
 aws_component_states = types.AwsComponentStates(
     repo = types.AwsComponentState(),
@@ -155,7 +122,42 @@ mqtt_client: mqtt_interface.MqttClientInterface = mqtt_interface.MqttClientInter
     aws_component_states,
     local_component_states,
     mqtt_client_options,
-    constants.MQTT_CLIENT_SUBSCRIPTION_TOPIC)
+    constants.MQTT_CLIENT_SUBSCRIPTION_TOPIC,
+    recorder=TrafficRecorder(constants.MQTT_CLIENT_RECORDING_FILEPATH, clock)
+        if constants.MQTT_CLIENT_RECORDING_FILEPATH else None,
+    brightness_callback=neopixel_client.set_brightness,
+    autostart=not use_asyncio_runtime)
+
+last_metrics_timestamp = clock.time()
+
+def render_frame():
+    """ Update local components so that pixels can move, and apply brightness changes """
+    global last_metrics_timestamp
+    for local_component in local_component_states.getAllComponentStates():
+        local_component.updatePixels()
+    neopixel_client.show_changes()
+
+    scheduled_brightness = brightness_schedule.check()
+    if scheduled_brightness is not None:
+        neopixel_client.set_brightness(scheduled_brightness)
+
+    if clock.time() - last_metrics_timestamp >= constants.METRICS_LOG_INTERVAL:
+        metrics = neopixel_client.metrics()
+        if runtime:
+            metrics.update(runtime.metrics())
+        logging.info(f"Render metrics: {metrics}")
+        last_metrics_timestamp = clock.time()
+
+runtime: AsyncRuntime = None
+if use_asyncio_runtime:
+    runtime = AsyncRuntime(
+        render_frame=render_frame,
+        handle_message=mqtt_client.handle_publish_packet,
+        handle_button=handle_button_pressed,
+        frame_interval=constants.FRAME_INTERVAL,
+        queue_size=constants.RUNTIME_QUEUE_SIZE,
+        shutdown_timeout=constants.RUNTIME_SHUTDOWN_TIMEOUT)
+    mqtt_client.message_dispatcher = runtime.post_message
 
 # Link button actions
 button_client_deployGreen: button_interface.ButtonInterface = button_interface.ButtonInterface(
@@ -171,14 +173,52 @@ button_client_enableDisableRegion2: button_interface.ButtonInterface = button_in
     constants.BUTTON_PORTS.get(types.Buttons.ENABLE_DISABLE_REGION2),
     on_button_clicked_callback_disableregion2)
 
+status_client: status_interface.StatusInterface = None
+if constants.STATUS_SERVER_ENABLED:
+    try:
+        status_client = status_interface.StatusInterface(
+            aws_component_states,
+            local_component_states,
+            neopixel_client,
+            host=constants.STATUS_SERVER_HOST,
+            port=constants.STATUS_SERVER_PORT,
+            max_wait=constants.STATUS_SERVER_MAX_WAIT)
+        status_client.start()
+    except OSError as error:
+        # The dashboard works without it, e.g. when the port is already taken
+        logging.error(f"Status server not started on {constants.STATUS_SERVER_HOST}:{constants.STATUS_SERVER_PORT}: {error}")
+
 signal.signal(signal.SIGINT, create_signal_handler(
-    mqtt_client, neopixel_client))
+    mqtt_client, neopixel_client, status_client, runtime))
 signal.signal(signal.SIGTERM, create_signal_handler(
-    mqtt_client, neopixel_client))
+    mqtt_client, neopixel_client, status_client, runtime))
 
 logging.info("Starting script execution")
 
-# On startup, publish a message to MQTT asking for all states
+async def startup():
+    await mqtt_client.connect_async(constants.RUNTIME_MQTT_TIMEOUT)
+    logging.info("Publishing message to get all states")
+    await mqtt_client.publish_message_async(
+        constants.MQTT_CLIENT_PUBLISHING_TOPIC,
+        constants.MQTT_CLIENT_PUBLISHING_MESSAGE_GETALLSTATES,
+        constants.RUNTIME_MQTT_TIMEOUT)
+
+# Run in order by the runtime, each step even if the previous one failed or timed out
+shutdown_steps = []
+if status_client:
+    shutdown_steps.append(("status server", status_client.cleanup))
+shutdown_steps += [
+    # Unsubscribe and stop share the time bound of the step
+    ("MQTT", lambda: mqtt_client.cleanup_async(constants.RUNTIME_SHUTDOWN_TIMEOUT / 2)),
+    ("stripes", neopixel_client.cleanup),
+    ("GPIO", GPIO.cleanup),
+]
+
+if runtime:
+    started = asyncio.run(runtime.run(startup, shutdown_steps))
+    sys.exit(0 if started else 1)
+
+# On startup, publish a message to MQTT asking for all states
 logging.info("Publishing message to get all states")
 mqtt_client.publish_message(
     constants.MQTT_CLIENT_PUBLISHING_TOPIC,
@@ -186,7 +226,4 @@ mqtt_client.publish_message(
 
 while True:
     # signal.pause()
-    # Constantly update local components so that pixels can move
-    for local_component in local_component_states.getAllComponentStates():
-        local_component.updatePixels()
-    neopixel_client.show_changes()
\ No newline at end of file
+    render_frame()
@@ -1,6 +1,9 @@
 import logging
 class board():
-  D18 = 0
+  D10 = 10
+  D12 = 12
+  D18 = 18
+  D21 = 21
   def __init__(
         self,
     ):
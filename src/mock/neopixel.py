@@ -3,6 +3,17 @@ import logging
 RGB = "RGB"
 GRB = "GRB"
 
+class _MockPin():
+  """ Stands in for the DigitalInOut pin of the real driver, linking back to its stripe """
+  def __init__(self, pin, strip):
+    self.pin = pin
+    self.strip = strip
+
+def neopixel_write(pin: _MockPin, buf: bytes) -> None:
+  """ Mock of neopixel_write, stores the bytes sent on the wire in the stripe buffer """
+  pin.strip.buf[:] = buf
+  pin.strip.show()
+
 class NeoPixel():
   def __init__(
         self,
@@ -15,9 +26,42 @@ class NeoPixel():
         pixel_order: str = None
     ):
     logging.info("NeoPixel MOCK init")
+    self.pin = _MockPin(pin, self)
+    self.n = n
+    self.bpp = bpp
+    self.auto_write = auto_write
+    self.pixel_order = pixel_order or GRB
+    # Byte offsets of r, g and b within one pixel, following pixel_order like the real driver
+    self._offsets = tuple(self.pixel_order.index(color) for color in RGB)
+    self.buf = bytearray(n * bpp)
+    self.show_count = 0
+
+  def __len__(self) -> int:
+    return self.n
+
+  def __setitem__(self, index: int, color) -> None:
+    start = index * self.bpp
+    for offset, value in zip(self._offsets, color):
+      self.buf[start + offset] = value
+    if self.auto_write:
+      self.show()
+
+  def __getitem__(self, index: int):
+    start = index * self.bpp
+    return tuple(self.buf[start + offset] for offset in self._offsets)
+
+  def fill(self, color) -> None:
+    auto_write = self.auto_write
+    self.auto_write = False
+    for index in range(self.n):
+      self[index] = color
+    self.auto_write = auto_write
+    if self.auto_write:
+      self.show()
 
   def deinit(self) -> None:
     logging.info("NeoPixel MOCK deinit")
 
   def show(self) -> None:
-    logging.debug("NeoPixel MOCK show")
\ No newline at end of file
+    logging.debug("NeoPixel MOCK show")
+    self.show_count = self.show_count + 1
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+""" Replay recorded `cicd/backend` traffic through the full render path.
+
+Usage: python3 -m src.replay --mock <recording.jsonl> [--speed 1|100|max] [--frames-out frames.txt] [--layout layout.json]
+"""
+import argparse
+import hashlib
+import logging
+import time
+
+from awscrt import mqtt5
+
+import src.interfaces.mqtt as mqtt_interface
+import src.interfaces.neopxl as neopixel_interface
+import src.utils.constants as constants
+import src.utils.types as types
+from src.utils.clock import ManualClock
+from src.utils.layout import load_layout
+from src.utils.recording import load_recording
+
+logging.basicConfig(level=constants.LOG_LEVEL)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay recorded MQTT traffic against the LED render path")
+    parser.add_argument("--mock", action="store_true", help="use the mock NeoPixel driver (must be the first argument)")
+    parser.add_argument("recording", help="JSON lines file written by TrafficRecorder")
+    parser.add_argument("--speed", default="max",
+                        help="replay speed relative to the recording, e.g. 1 or 100, or 'max' for as fast as possible")
+    parser.add_argument("--tail", type=float, default=1.0,
+                        help="seconds to keep rendering after the last message")
+    parser.add_argument("--frames-out", help="write one line per frame (time offset and frame bytes as hex)")
+    parser.add_argument("--layout", default=constants.LAYOUT_FILEPATH, help="layout file to render with")
+    return parser.parse_args()
+
+def create_components(neopixel_client: neopixel_interface.NeopixelInterface, layout):
+    """ Build the same components as main.py, using the default actions """
+    aws_component_states = types.AwsComponentStates(
+        **{component_id.value: types.AwsComponentState() for component_id in types.ComponentIds})
+    return aws_component_states, types.LocalComponentStates.fromLayout(neopixel_client, layout)
+
+def replay(recording: str, speed: float, tail: float, frames_out: str = None,
+           layout_filepath: str = constants.LAYOUT_FILEPATH):
+    """ Replays a recording, speed 0 meaning as fast as possible. Returns a summary of the run. """
+    messages = load_recording(recording)
+    if not messages:
+        raise ValueError(f"Recording {recording} contains no messages")
+
+    start_time = messages[0].timestamp
+    end_time = messages[-1].timestamp + tail
+    clock = ManualClock(start=start_time)
+    layout = load_layout(layout_filepath)
+    neopixel_client = neopixel_interface.NeopixelInterface(
+        strips=layout.strips,
+        clock=clock,
+        frame_cache_max_bytes=constants.EFFECT_FRAME_CACHE_MAX_BYTES,
+        gamma=constants.NEOPIXEL_GAMMA,
+        brightness=constants.NEOPIXEL_BRIGHTNESS)
+    aws_component_states, local_component_states = create_components(neopixel_client, layout)
+    mqtt_client = mqtt_interface.MqttClientInterface(
+        aws_component_states,
+        local_component_states,
+        None,
+        constants.MQTT_CLIENT_SUBSCRIPTION_TOPIC,
+        brightness_callback=neopixel_client.set_brightness)
+
+    frames_file = open(frames_out, "w", encoding="utf-8") if frames_out else None
+    digest = hashlib.sha256()
+    nb_frames = 0
+    next_frame_time = start_time
+    wall_start = time.perf_counter()
+
+    def render_frame(frame_time: float):
+        nonlocal nb_frames
+        clock.set(frame_time)
+        if speed:
+            delay = wall_start + (frame_time - start_time) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        for local_component in local_component_states.getAllComponentStates():
+            local_component.updatePixels()
+        neopixel_client.show_changes()
+        frame = neopixel_client.frame()
+        digest.update(frame)
+        if frames_file:
+            frames_file.write(f"{frame_time - start_time:.3f} {frame.hex()}\n")
+        nb_frames = nb_frames + 1
+
+    for message in messages:
+        while next_frame_time <= message.timestamp:
+            render_frame(next_frame_time)
+            next_frame_time = start_time + nb_frames * constants.FRAME_INTERVAL
+        clock.set(message.timestamp)
+        mqtt_client._on_publish_received(mqtt5.PublishReceivedData(
+            publish_packet=mqtt5.PublishPacket(
+                topic=message.topic,
+                payload=message.payload.encode("utf-8"))))
+
+    while next_frame_time <= end_time:
+        render_frame(next_frame_time)
+        next_frame_time = start_time + nb_frames * constants.FRAME_INTERVAL
+
+    wall_elapsed = time.perf_counter() - wall_start
+    if frames_file:
+        frames_file.close()
+    neopixel_client.cleanup()
+
+    return {
+        "messages": len(messages),
+        "frames": nb_frames,
+        "recorded_seconds": round(end_time - start_time, 3),
+        "wall_seconds": round(wall_elapsed, 3),
+        "frames_per_second": round(nb_frames / wall_elapsed, 1) if wall_elapsed else None,
+        "messages_per_second": round(len(messages) / wall_elapsed, 1) if wall_elapsed else None,
+        "frames_sha256": digest.hexdigest(),
+        **neopixel_client.metrics(),
+    }
+
+if __name__ == "__main__":
+    args = parse_args()
+    speed = 0 if args.speed == "max" else float(args.speed)
+    summary = replay(args.recording, speed, args.tail, args.frames_out, args.layout)
+    for key, value in summary.items():
+        logging.info(f"{key}: {value}")
@@ -0,0 +1,21 @@
+import time
+
+
+class SystemClock():
+    """ Wall clock, used when running against the real backend """
+    def time(self) -> float:
+        return time.time()
+
+
+class ManualClock():
+    """ Deterministic clock which only moves when set explicitly, e.g. by the replay tool """
+    def __init__(self, start: float = 0.0):
+        self.current_time = start
+
+    def time(self) -> float:
+        return self.current_time
+
+    def set(self, timestamp: float):
+        """ Jump to an absolute timestamp, never moving backwards """
+        if timestamp > self.current_time:
+            self.current_time = timestamp
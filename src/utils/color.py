@@ -0,0 +1,47 @@
+import time
+import logging
+from typing import List, Tuple
+
+def build_lut(gamma: float, brightness: float) -> bytes:
+    """ 256 entry table mapping a channel value to its gamma corrected and dimmed value, for bytes.translate.
+    Non-zero values stay at least 1 as long as brightness is above 0, so dim indicators don't vanish. """
+    brightness = min(max(brightness, 0.0), 1.0)
+    lut = bytearray(256)
+    for value in range(1, 256):
+        corrected = round(((value / 255) ** gamma) * brightness * 255)
+        lut[value] = max(corrected, 1) if brightness > 0 else 0
+    return bytes(lut)
+
+class BrightnessSchedule():
+    """ Daily brightness schedule, e.g. [("07:00", 1.0), ("19:00", 0.2)]
+
+    check() only returns a value when a new slot starts, so a brightness set in between (e.g. via MQTT)
+    is kept until the next scheduled change.
+    """
+    def __init__(self, entries: List[Tuple[str, float]], clock):
+        self.clock = clock
+        self.entries = sorted(
+            (int(start.split(":")[0]) * 60 + int(start.split(":")[1]), brightness) for start, brightness in entries)
+        self.current_slot = None
+
+    def brightness_at(self, timestamp: float):
+        """ Returns (slot index, brightness) for a clock time, None if the schedule is empty """
+        if not self.entries:
+            return None
+        local_time = time.localtime(timestamp)
+        minute_of_day = local_time.tm_hour * 60 + local_time.tm_min
+        # Before the first entry of the day, the last entry of the previous day still applies
+        slot = len(self.entries) - 1
+        for index, (start_minute, _) in enumerate(self.entries):
+            if start_minute <= minute_of_day:
+                slot = index
+        return slot, self.entries[slot][1]
+
+    def check(self):
+        """ Brightness to apply if a new slot started since the last check, otherwise None """
+        scheduled = self.brightness_at(self.clock.time())
+        if scheduled is None or scheduled[0] == self.current_slot:
+            return None
+        self.current_slot = scheduled[0]
+        logging.info(f"Brightness schedule: switching to {scheduled[1]}")
+        return scheduled[1]
@@ -1,12 +1,6 @@
 import os
-import sys
 import logging
 
-if sys.argv and len(sys.argv) > 1 and sys.argv[1] == "--mock":
-    from src.mock.board import board as board  # use for non-Raspi testing
-else:
-    import board as board # use on Raspi
-
 import src.utils.types as types
 import json
 
@@ -14,17 +8,6 @@ LOG_LEVEL = logging.INFO
 DIR_PATH = os.path.dirname(os.path.abspath(__file__))
 CERTIFICATES_PATH = os.path.join(DIR_PATH, "certificates")
 
-# Pixel settings
-COMPONENT_PIXELS = {
-    'repo': [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11],
-    'build': [12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23],
-    'qa': [24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35],
-    'transitionRegion1': [36, 37, 38, 39, 40, 41, 42, 43, 44, 45, 46, 47],
-    'region1': [36, 37, 38, 39, 40, 41, 42, 43, 44, 45, 46, 47],
-    'transitionRegion2': [48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59],
-    'region2': [48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59]
-}
-
 # Ports for the buttons
 BUTTON_PORTS = {
     str(types.Buttons.DEPLOY_GREEN): 23,
@@ -33,10 +16,21 @@ BUTTON_PORTS = {
     str(types.Buttons.ENABLE_DISABLE_REGION2): 25
 }
 
-# Port for Neopixel LED stripe
-NEOPIXEL_PORT = board.D18
-# Number of LED pixels used for Neopixel stripe
-NEOPIXEL_NB_PIXELS = 60
+# Stripes, segments and the pixels of each component, see README
+LAYOUT_FILEPATH = os.path.join(DIR_PATH, "layout.json")
+# Gamma correction applied to all colors, 1.0 disables it. Values above 1 darken the action colors, e.g. with 2.2
+# orange (100, 255, 0) is shown as (32, 255, 0) and the dim red of OFF (10, 0, 0) as (1, 0, 0)
+NEOPIXEL_GAMMA = 1.0
+# Global brightness (0.0 - 1.0) at startup, can be changed via MQTT or the schedule below
+NEOPIXEL_BRIGHTNESS = 1.0
+# Daily brightness schedule as ("HH:MM", brightness), e.g. [("07:00", 1.0), ("19:00", 0.2)], empty to disable
+NEOPIXEL_BRIGHTNESS_SCHEDULE = []
+# Time between two rendered frames of the asyncio runtime and of replays
+FRAME_INTERVAL = 1 / 30
+# Memory bound of the cache holding rendered frame sequences of effects
+EFFECT_FRAME_CACHE_MAX_BYTES = 1024 * 1024
+# Seconds between two log lines with render metrics (e.g. frame cache hit rate)
+METRICS_LOG_INTERVAL = 60
 
 # Default LED actions
 DEFAULT_LED_ACTIONS = {
@@ -66,3 +60,18 @@ MQTT_CLIENT_PUBLISHING_MESSAGE_PRESSED = json.dumps({"type": "buttonPressed", "b
 
 # MQTT listening topic
 MQTT_CLIENT_SUBSCRIPTION_TOPIC = "cicd/backend"
+# Record inbound messages to this file for replays with `python3 -m src.replay`, None to disable
+MQTT_CLIENT_RECORDING_FILEPATH = None
+
+# Local read-only status endpoint for dashboards, see src/interfaces/status.py
+STATUS_SERVER_ENABLED = False
+STATUS_SERVER_HOST = "127.0.0.1"
+STATUS_SERVER_PORT = 8080
+# Upper bound for long-polling requests (`?wait=<seconds>`)
+STATUS_SERVER_MAX_WAIT = 30
+
+# asyncio runtime (`--asyncio`): pending messages / button presses, and upper bound of each awaited shutdown step
+RUNTIME_QUEUE_SIZE = 1000
+RUNTIME_SHUTDOWN_TIMEOUT = 5
+# Seconds to wait for the MQTT connection and PubAcks in the asyncio runtime
+RUNTIME_MQTT_TIMEOUT = 30
@@ -0,0 +1,155 @@
+import math
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+from src.utils.types import EffectAction
+
+BLACK = (0, 0, 0)
+
+class Effect():
+    """ LED effect declared with default parameters
+    Args:
+        name (str): Name used by EffectAction to refer to the effect.
+        render (Callable): render(length, **params) returning the full cycle of frames for a segment,
+            each frame holding 3 bytes (r, g, b) per pixel.
+        fps (float): Frames of the cycle shown per second, 0 for static effects. Can be overridden with the `fps` param.
+        defaults (dict): Default parameters passed to render.
+    """
+    def __init__(self, name: str, render: Callable[..., List[bytes]], fps: float, defaults: dict):
+        self.name = name
+        self.render = render
+        self.fps = fps
+        self.defaults = defaults
+
+# All registered effects by name
+EFFECTS: Dict[str, Effect] = {}
+
+def register_effect(name: str, fps: float = 0, **defaults):
+    """ Decorator registering a render function as effect, e.g.
+
+        @register_effect('my_effect', fps=10, color=(255, 0, 0))
+        def _my_effect(length, color):
+            return [bytes(color) * length]
+    """
+    def decorator(render):
+        EFFECTS[name] = Effect(name, render, fps, defaults)
+        return render
+    return decorator
+
+class FrameCache():
+    """ LRU cache of rendered frame sequences per (effect, params, segment length), bounded in bytes """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Keys whose frames exceed max_bytes, rendered on every lookup and only warned about once
+        self.oversized_keys = set()
+        self.oversized = 0
+
+    def get(self, effect_action: EffectAction, length: int) -> Tuple[Tuple[bytes, ...], float]:
+        """ Returns the frames of the effect and the fps they are played at """
+        key = (effect_action, length)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits = self.hits + 1
+            self.entries.move_to_end(key)
+            return entry
+
+        self.misses = self.misses + 1
+        entry = render_effect(effect_action, length)
+        if key in self.oversized_keys:
+            self.oversized = self.oversized + 1
+            return entry
+        entry_size = sum(len(frame) for frame in entry[0])
+        if entry_size > self.max_bytes:
+            logging.warning(f"Frames of {effect_action} ({entry_size} bytes) exceed the frame cache size, not cached")
+            self.oversized_keys.add(key)
+            self.oversized = self.oversized + 1
+            return entry
+        self.entries[key] = entry
+        self.size = self.size + entry_size
+        while self.size > self.max_bytes:
+            _, (evicted_frames, _) = self.entries.popitem(last=False)
+            self.size = self.size - sum(len(frame) for frame in evicted_frames)
+            self.evictions = self.evictions + 1
+        return entry
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "oversized": self.oversized,
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+        }
+
+def render_effect(effect_action: EffectAction, length: int) -> Tuple[Tuple[bytes, ...], float]:
+    """ Render all frames of an effect, bypassing the cache """
+    effect = EFFECTS.get(effect_action.name)
+    if not effect:
+        raise ValueError(f"ERROR: Unknown effect: {effect_action.name}. Please register it first!")
+    params = dict(effect.defaults)
+    params.update(effect_action.params)
+    fps = params.pop("fps", effect.fps)
+    return tuple(effect.render(length, **params)), fps
+
+def frame_at(frames: Tuple[bytes, ...], fps: float, timestamp: float) -> bytes:
+    """ Pick the frame of a cycle to show at a given clock time """
+    if fps and len(frames) > 1:
+        return frames[int(timestamp * fps) % len(frames)]
+    return frames[0]
+
+def _scale(color, factor: float):
+    return tuple(int(value * factor) for value in color)
+
+@register_effect('solid', color=(255, 255, 255))
+def _solid(length, color):
+    return [bytes(color) * length]
+
+@register_effect('blink', fps=2, color=(255, 255, 255), background=BLACK, on_frames=1, off_frames=1)
+def _blink(length, color, background, on_frames, off_frames):
+    return [bytes(color) * length] * on_frames + [bytes(background) * length] * off_frames
+
+@register_effect('progress_bar', color=(0, 255, 0), background=BLACK, progress=0.0)
+def _progress_bar(length, color, background, progress):
+    lit = round(min(max(progress, 0.0), 1.0) * length)
+    return [bytes(color) * lit + bytes(background) * (length - lit)]
+
+@register_effect('chase', fps=10, levels=(
+        (255, 255, 255),  # Full brightness
+        (128, 128, 128),  # 50% brightness
+        (64, 64, 64),     # 25% brightness
+        (25, 25, 25)      # 10% brightness
+    ), background=BLACK)
+def _chase(length, levels, background):
+    frames = []
+    for head_position in range(length):
+        frame = bytearray()
+        for i in range(length):
+            # Distance of the current pixel from the head position
+            distance = (i - head_position) % length
+            frame += bytes(levels[distance] if distance < len(levels) else background)
+        frames.append(bytes(frame))
+    return frames
+
+@register_effect('pulse', fps=30, color=(255, 255, 255), minimum=50, maximum=255, steps=100)
+def _pulse(length, color, minimum, maximum, steps):
+    amplitude = (maximum - minimum) / 2
+    offset = (maximum + minimum) / 2
+    return [bytes(_scale(color, (amplitude * math.sin(2 * math.pi * step / steps) + offset) / 255)) * length
+            for step in range(steps)]
+
+@register_effect('color_wipe', fps=20, color=(255, 255, 255), background=BLACK)
+def _color_wipe(length, color, background):
+    # Fill the segment pixel by pixel, then clear it again in the same direction
+    wipe_in = [bytes(color) * lit + bytes(background) * (length - lit) for lit in range(1, length + 1)]
+    wipe_out = [bytes(background) * cleared + bytes(color) * (length - cleared) for cleared in range(1, length + 1)]
+    return wipe_in + wipe_out
@@ -0,0 +1,148 @@
+import sys
+import json
+from operator import itemgetter
+from typing import Dict, List
+
+if sys.argv and len(sys.argv) > 1 and sys.argv[1] == "--mock":
+    from src.mock.board import board as board  # use for non-Raspi testing
+    # Every mock NeoPixel keeps its own buffer, so any number of stripes can be simulated
+    MAX_STRIPS = None
+else:
+    import board as board # use on Raspi
+    # Blinka drives a single global ws281x strip on the Raspi: a second NeoPixel would overwrite the first
+    MAX_STRIPS = 1
+
+# Color orders of 3 byte pixels, RGBW stripes are not supported
+PIXEL_ORDERS = ("RGB", "RBG", "GRB", "GBR", "BRG", "BGR")
+
+class StripLayout():
+    """ One physical LED stripe
+    Args:
+        name (str): Name segments refer to.
+        port (str): Board pin the stripe is connected to, e.g. "D18".
+        nb_pixels (int): Number of pixels of the stripe.
+        pixel_order (str): Order of the colors on the wire, e.g. "GRB".
+        offset (int): Position of the stripe's first pixel in the framebuffer of all stripes.
+    """
+    def __init__(self, name: str, port: str, nb_pixels: int, pixel_order: str, offset: int):
+        self.name = name
+        self.port = port
+        self.pin = getattr(board, port)
+        self.nb_pixels = nb_pixels
+        self.pixel_order = pixel_order
+        self.offset = offset
+
+class PixelMap():
+    """ Compiled mapping of a component's pixels into the framebuffer.
+
+    Each run copies a slice of the rendered component frame into a contiguous framebuffer slice,
+    reordered by a precomputed itemgetter when the segment is reversed or serpentine.
+    """
+    def __init__(self, runs: list, length: int):
+        # (framebuffer start, framebuffer stop, frame start, frame stop, itemgetter or None) in bytes
+        self.runs = runs
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def write(self, framebuffer: bytearray, frame: bytes):
+        for dest_start, dest_stop, src_start, src_stop, reorder in self.runs:
+            if reorder is None:
+                framebuffer[dest_start:dest_stop] = frame[src_start:src_stop]
+            else:
+                framebuffer[dest_start:dest_stop] = bytes(reorder(frame))
+
+    @classmethod
+    def from_indices(cls, indices: List[int]):
+        """ Compile a plain list of framebuffer pixel indices, one run per ascending sequence """
+        runs = []
+        run_start = 0
+        for position in range(1, len(indices) + 1):
+            if position == len(indices) or indices[position] != indices[position - 1] + 1:
+                runs.append((indices[run_start] * 3, (indices[position - 1] + 1) * 3,
+                             run_start * 3, position * 3, None))
+                run_start = position
+        return cls(runs, len(indices))
+
+class Layout():
+    """ Compiled layout: the stripes and the pixel map of every component """
+    def __init__(self, strips: List[StripLayout], components: Dict[str, PixelMap]):
+        self.strips = strips
+        self.components = components
+        self.nb_pixels = sum(strip.nb_pixels for strip in strips)
+
+def _segment_order(count: int, reversed_order: bool, serpentine: int) -> List[int]:
+    """ Physical position within the segment for every logical pixel """
+    order = list(range(count))
+    if serpentine:
+        # Rows of `serpentine` pixels, every second row wired in the opposite direction
+        for logical in range(count):
+            row, column = divmod(logical, serpentine)
+            row_start = row * serpentine
+            row_length = min(serpentine, count - row_start)
+            order[logical] = row_start + (column if row % 2 == 0 else row_length - 1 - column)
+    if reversed_order:
+        order.reverse()
+    return order
+
+def _compile_segment(name: str, segment: dict, strips: Dict[str, StripLayout], src_start: int) -> tuple:
+    strip = strips.get(segment.get("strip"))
+    if not strip:
+        raise ValueError(f"Layout: segment '{name}' refers to unknown strip '{segment.get('strip')}'")
+    start = segment.get("start", 0)
+    count = segment.get("count", strip.nb_pixels - start)
+    if start < 0 or count <= 0 or start + count > strip.nb_pixels:
+        raise ValueError(f"Layout: segment '{name}' ({start} - {start + count - 1}) is outside of strip '{strip.name}'")
+    order = _segment_order(count, segment.get("reversed", False), segment.get("serpentine", 0))
+
+    # Invert the mapping: which logical pixel feeds each physical pixel, in framebuffer order
+    sources = [0] * count
+    for logical, physical in enumerate(order):
+        sources[physical] = logical
+    reorder = None
+    if sources != list(range(count)):
+        reorder = itemgetter(*[(src_start + logical) * 3 + color for logical in sources for color in range(3)])
+    dest_start = (strip.offset + start) * 3
+    return (dest_start, dest_start + count * 3, src_start * 3, (src_start + count) * 3, reorder), count
+
+def load_layout(filepath: str, max_strips: int = MAX_STRIPS) -> Layout:
+    """ Read a layout file and compile it into flat pixel maps, see README for the format """
+    with open(filepath, "r", encoding="utf-8") as file:
+        definition = json.load(file)
+
+    strips = {}
+    offset = 0
+    for strip in definition.get("strips", []):
+        if strip["name"] in strips:
+            raise ValueError(f"Layout: strip '{strip['name']}' is defined twice")
+        pixel_order = strip.get("pixel_order", "GRB")
+        if pixel_order not in PIXEL_ORDERS:
+            raise ValueError(f"Layout: strip '{strip['name']}' has unsupported pixel_order '{pixel_order}', "
+                             f"expected one of {', '.join(PIXEL_ORDERS)}")
+        strips[strip["name"]] = StripLayout(
+            name=strip["name"],
+            port=strip["port"],
+            nb_pixels=strip["pixels"],
+            pixel_order=pixel_order,
+            offset=offset)
+        offset = offset + strip["pixels"]
+    if not strips:
+        raise ValueError("Layout: at least one strip is required")
+    if max_strips and len(strips) > max_strips:
+        raise ValueError(f"Layout: {len(strips)} strips defined, but the NeoPixel driver supports {max_strips}")
+
+    segments = definition.get("segments", {})
+    components = {}
+    for component_id, segment_names in definition.get("components", {}).items():
+        runs = []
+        length = 0
+        for segment_name in segment_names:
+            if segment_name not in segments:
+                raise ValueError(f"Layout: component '{component_id}' refers to unknown segment '{segment_name}'")
+            run, count = _compile_segment(segment_name, segments[segment_name], strips, length)
+            runs.append(run)
+            length = length + count
+        components[component_id] = PixelMap(runs, length)
+
+    return Layout(list(strips.values()), components)
@@ -0,0 +1,14 @@
+import threading
+
+class ChangeNotifier():
+    """ Wakes up threads waiting for a change, without the notifying side ever waiting for them.
+
+    Every change sets the current event and replaces it with a fresh one, so nobody has to clear it.
+    Waiters take `event` before checking their condition and then wait on it with a timeout.
+    """
+    def __init__(self):
+        self.event = threading.Event()
+
+    def notify(self):
+        event, self.event = self.event, threading.Event()
+        event.set()
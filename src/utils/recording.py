@@ -0,0 +1,49 @@
+import json
+import logging
+from dataclasses import dataclass
+from typing import List
+
+
+@dataclass
+class RecordedMessage:
+    """ Inbound MQTT message together with the time it was received
+    Args:
+        timestamp (float): Clock time the message was received at.
+        topic (str): Topic the message was published on.
+        payload (str): Raw payload, decoded as utf-8.
+    """
+    timestamp: float
+    topic: str
+    payload: str
+
+
+class TrafficRecorder():
+    """ Appends inbound MQTT messages to a JSON lines file so they can be replayed later """
+    def __init__(self, filepath: str, clock):
+        self.filepath = filepath
+        self.clock = clock
+        self.file = open(filepath, "a", encoding="utf-8")
+        logging.info(f"Recording inbound MQTT traffic to {filepath}")
+
+    def record(self, topic: str, payload: bytes):
+        message = RecordedMessage(
+            timestamp=self.clock.time(),
+            topic=topic,
+            payload=payload.decode("utf-8") if payload else "")
+        self.file.write(json.dumps(message.__dict__) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def load_recording(filepath: str) -> List[RecordedMessage]:
+    """ Read a recording written by TrafficRecorder, ordered by timestamp """
+    messages = []
+    with open(filepath, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                messages.append(RecordedMessage(**json.loads(line)))
+    messages.sort(key=lambda message: message.timestamp)
+    return messages
@@ -0,0 +1,239 @@
+import asyncio
+import inspect
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+class LatencyStats():
+    """ Latency of recent samples in milliseconds """
+    def __init__(self, max_samples: int = 10000):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds * 1000)
+        self.count = self.count + 1
+
+    def stats(self) -> dict:
+        if not self.samples:
+            return {"count": self.count}
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "mean_ms": round(sum(ordered) / len(ordered), 3),
+            "p50_ms": round(ordered[len(ordered) // 2], 3),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3),
+            "max_ms": round(ordered[-1], 3),
+        }
+
+class AsyncRuntime():
+    """ Runs MQTT messages, button presses and rendering on one asyncio event loop.
+
+    awscrt and RPi.GPIO call back on their own threads; they only hand work over with post_message()
+    and post_button(), which are thread-safe. Messages wait for queue space (backpressure on the awscrt
+    thread), button presses are dropped when the queue is full. Rendering runs on a frame timer with
+    fixed deadlines, frames that are too late are skipped instead of piling up.
+
+    A stop request cancels a pending startup. On stop, every shutdown step runs even if an earlier one
+    failed or timed out.
+
+    Args:
+        render_frame (Callable): Renders and pushes one frame.
+        handle_message (Callable): Applies a received MQTT publish packet.
+        handle_button (Callable): Coroutine handling a button press, e.g. publishing it.
+        frame_interval (float): Seconds between two frames.
+        queue_size (int): Maximum pending messages and button presses each.
+        shutdown_timeout (float): Upper bound for stopping the tasks, a cancelled startup and every awaitable shutdown step.
+    """
+    def __init__(self,
+                 render_frame: Callable[[], None],
+                 handle_message: Callable[[object], None],
+                 handle_button: Callable[[str], Awaitable[None]],
+                 frame_interval: float,
+                 queue_size: int = 1000,
+                 shutdown_timeout: float = 5):
+        self.render_frame = render_frame
+        self.handle_message = handle_message
+        self.handle_button = handle_button
+        self.frame_interval = frame_interval
+        self.queue_size = queue_size
+        self.shutdown_timeout = shutdown_timeout
+        self.loop: asyncio.AbstractEventLoop = None
+        self.messages: asyncio.Queue = None
+        self.buttons: asyncio.Queue = None
+        self.stopped: asyncio.Event = None
+        # Set by request_stop() even before run(), so an early stop request isn't lost
+        self.stop_requested = False
+        self.button_tasks = set()
+        self.message_latency = LatencyStats()
+        self.button_latency = LatencyStats()
+        self.frame_lateness = LatencyStats()
+        self.skipped_frames = 0
+        self.dropped_messages = 0
+        self.dropped_buttons = 0
+
+    def post_message(self, publish_packet):
+        """ Thread-safe, blocks the calling thread while the message queue is full """
+        if not self.loop or self.loop.is_closed():
+            logging.warning("Runtime not running, message dropped")
+            return
+        try:
+            future = asyncio.run_coroutine_threadsafe(
+                self.messages.put((time.perf_counter(), publish_packet)), self.loop)
+        except RuntimeError:
+            logging.warning("Runtime stopped, message dropped")
+            return
+        try:
+            future.result(self.shutdown_timeout)
+        except Exception:
+            future.cancel()
+            self.dropped_messages = self.dropped_messages + 1
+            logging.warning("Runtime message queue full, message dropped")
+
+    def post_button(self, button: str):
+        """ Thread-safe, e.g. from RPi.GPIO callbacks """
+        if not self.loop or self.loop.is_closed():
+            logging.warning("Runtime not running, button press dropped")
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._enqueue_button, time.perf_counter(), button)
+        except RuntimeError:
+            logging.warning("Runtime stopped, button press dropped")
+
+    def _enqueue_button(self, posted: float, button: str):
+        try:
+            self.buttons.put_nowait((posted, button))
+        except asyncio.QueueFull:
+            self.dropped_buttons = self.dropped_buttons + 1
+            logging.warning(f"Runtime button queue full, press of {button} dropped")
+
+    def request_stop(self):
+        """ Thread-safe, also from signal handlers and before run(): stop gracefully """
+        self.stop_requested = True
+        if self.loop and not self.loop.is_closed():
+            try:
+                self.loop.call_soon_threadsafe(self.stopped.set)
+            except RuntimeError:
+                pass
+
+    async def _process_messages(self):
+        while True:
+            posted, publish_packet = await self.messages.get()
+            try:
+                self.handle_message(publish_packet)
+            except Exception:
+                logging.exception("Failed to process message")
+            self.message_latency.add(time.perf_counter() - posted)
+
+    async def _handle_button(self, posted: float, button: str):
+        try:
+            await self.handle_button(button)
+        except Exception:
+            logging.exception(f"Failed to handle press of {button}")
+        self.button_latency.add(time.perf_counter() - posted)
+
+    async def _process_buttons(self):
+        while True:
+            posted, button = await self.buttons.get()
+            # One task per press, so waiting for a PubAck doesn't delay the following presses
+            task = asyncio.create_task(self._handle_button(posted, button))
+            self.button_tasks.add(task)
+            task.add_done_callback(self.button_tasks.discard)
+
+    async def _render(self):
+        next_frame = self.loop.time()
+        while True:
+            self.frame_lateness.add(max(0.0, self.loop.time() - next_frame))
+            try:
+                self.render_frame()
+            except Exception:
+                logging.exception("Failed to render frame")
+            next_frame = next_frame + self.frame_interval
+            now = self.loop.time()
+            if now > next_frame:
+                # Too late for one or more frames, skip them and keep the frame grid
+                missed = int((now - next_frame) / self.frame_interval) + 1
+                self.skipped_frames = self.skipped_frames + missed
+                next_frame = next_frame + missed * self.frame_interval
+            await asyncio.sleep(next_frame - now)
+
+    async def _startup(self, startup: Callable[[], Awaitable[None]]) -> bool:
+        """ Run startup until it is done or a stop is requested, returns False if it failed """
+        startup_task = asyncio.create_task(startup(), name="startup")
+        stopped_task = asyncio.create_task(self.stopped.wait(), name="stopped")
+        await asyncio.wait({startup_task, stopped_task}, return_when=asyncio.FIRST_COMPLETED)
+        stopped_task.cancel()
+        if not startup_task.done():
+            logging.info("Runtime stop requested during startup")
+            startup_task.cancel()
+            await asyncio.wait({startup_task}, timeout=self.shutdown_timeout)
+            return True
+        if startup_task.cancelled():
+            return True
+        error = startup_task.exception()
+        if error:
+            logging.error(f"Runtime startup failed: {error!r}")
+            return False
+        return True
+
+    async def _shutdown_step(self, name: str, step: Callable[[], Optional[Awaitable[None]]]):
+        """ Run one shutdown step, awaiting it at most shutdown_timeout. Failures are logged, not raised. """
+        try:
+            result = step()
+            if inspect.isawaitable(result):
+                await asyncio.wait_for(result, self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Runtime shutdown step '{name}' timed out")
+        except Exception:
+            logging.exception(f"Runtime shutdown step '{name}' failed")
+
+    async def run(self,
+                  startup: Callable[[], Awaitable[None]] = None,
+                  shutdown: List[Tuple[str, Callable[[], Optional[Awaitable[None]]]]] = ()) -> bool:
+        """ Run until request_stop() is called, then cancel all tasks and run the (name, step) shutdown steps in order.
+
+        Returns False if startup failed.
+        """
+        self.messages = asyncio.Queue(self.queue_size)
+        self.buttons = asyncio.Queue(self.queue_size)
+        self.stopped = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        # Checked after the loop is set: a request_stop() from now on sets self.stopped itself
+        if self.stop_requested:
+            self.stopped.set()
+
+        tasks = [
+            asyncio.create_task(self._process_messages(), name="messages"),
+            asyncio.create_task(self._process_buttons(), name="buttons"),
+            asyncio.create_task(self._render(), name="render"),
+        ]
+        started = True
+        try:
+            if startup:
+                started = await self._startup(startup)
+            if started:
+                await self.stopped.wait()
+        finally:
+            logging.info("Runtime stopping")
+            tasks = tasks + list(self.button_tasks)
+            for task in tasks:
+                task.cancel()
+            _, pending = await asyncio.wait(tasks, timeout=self.shutdown_timeout)
+            if pending:
+                logging.warning(f"Runtime tasks did not stop in time: {[task.get_name() for task in pending]}")
+            for name, step in shutdown:
+                await self._shutdown_step(name, step)
+            logging.info(f"Runtime metrics: {self.metrics()}")
+        return started
+
+    def metrics(self) -> dict:
+        return {
+            "message_latency": self.message_latency.stats(),
+            "button_latency": self.button_latency.stats(),
+            "frame_lateness": self.frame_lateness.stats(),
+            "skipped_frames": self.skipped_frames,
+            "dropped_messages": self.dropped_messages,
+            "dropped_buttons": self.dropped_buttons,
+        }
@@ -1,8 +1,9 @@
 from enum import Enum
 from dataclasses import dataclass
-from typing import List
 import logging
 
+from src.utils.layout import Layout, PixelMap
+
 @dataclass
 class State:
     PROCESSING = 'processing'
@@ -32,6 +33,20 @@ class Action(Enum):
     WHITE = 4
     RUNNING_LIGHT = 5
 
+@dataclass(frozen=True)
+class EffectAction:
+    """ LED action rendered by an effect registered in `src/utils/effects.py`
+    Args:
+        name (str): Name of the registered effect, e.g. 'pulse'.
+        params (tuple): Sorted (name, value) pairs overriding the effect defaults, values must be hashable.
+    """
+    name: str
+    params: tuple = ()
+
+    @classmethod
+    def create(cls, name: str, **params):
+        return cls(name, tuple(sorted(params.items())))
+
 class ComponentIds(str, Enum):
     repo = 'repo'
     build = 'build'
@@ -58,6 +73,10 @@ class AwsComponentStates:
     region2: AwsComponentState
 
     _instance = None
+    # Incremented on every update, lets readers detect changes without locking
+    version = 0
+    # Notified after every update when set, e.g. by StatusInterface to wake up long-polling requests
+    changed = None
     
     def __new__(cls, *args, **kwargs):
         if not isinstance(cls._instance, cls):
@@ -79,6 +98,9 @@ class AwsComponentStates:
             self.transitionRegion2 = aws_component_state
         elif component_id == ComponentIds.region2:
             self.region2 = aws_component_state
+        self.version = self.version + 1
+        if self.changed:
+            self.changed.notify()
 
     def getComponentState(self, component_id: str) -> AwsComponentState:
         if component_id == ComponentIds.repo:
@@ -105,7 +127,7 @@ class LocalComponent():
     def __init__(self,
                  neopixel_client: NeopixelInterface,
                  state_id: ComponentIds,
-                 pixels: List[int],
+                 pixels: PixelMap,
                  processing_action_red:Action = DEFAULT_LED_ACTIONS.get(State.PROCESSING + Deployment.RED),
                  processing_action_green:Action = DEFAULT_LED_ACTIONS.get(State.PROCESSING + Deployment.GREEN),
                  successful_action_red:Action = DEFAULT_LED_ACTIONS.get(State.SUCCESSFUL + Deployment.RED),
@@ -118,7 +140,8 @@ class LocalComponent():
                  enabled_action_green:Action = DEFAULT_LED_ACTIONS.get(State.ENABLED + Deployment.GREEN)):
         self.neopixel_client = neopixel_client
         self.state_id = state_id
-        self.pixels = pixels
+        # Plain lists of pixel indices are compiled once, so rendering never translates single pixels
+        self.pixels = pixels if isinstance(pixels, PixelMap) else PixelMap.from_indices(pixels)
         self.processing_action_red = processing_action_red
         self.processing_action_green = processing_action_green
         self.successful_action_red = successful_action_red
@@ -132,6 +155,33 @@ class LocalComponent():
         self.deployment = ''
         self.state = ''
 
+    def currentAction(self):
+        """ Action (or EffectAction) for the current deployment and state, None if there is none """
+        # Using ugly if/elif to ensure the script runs on Python < 3.10
+        if self.deployment == Deployment.RED:
+            if self.state == State.PROCESSING:
+                return self.processing_action_red
+            elif self.state == State.SUCCESSFUL:
+                return self.successful_action_red
+            elif self.state == State.FAILED:
+                return self.failed_action_red
+            elif self.state == State.DISABLED:
+                return self.disabled_action_red
+            elif self.state == State.ENABLED:
+                return self.enabled_action_red
+        elif self.deployment == Deployment.GREEN:
+            if self.state == State.PROCESSING:
+                return self.processing_action_green
+            elif self.state == State.SUCCESSFUL:
+                return self.successful_action_green
+            elif self.state == State.FAILED:
+                return self.failed_action_green
+            elif self.state == State.DISABLED:
+                return self.disabled_action_green
+            elif self.state == State.ENABLED:
+                return self.enabled_action_green
+        return None
+
     def _forward_action_to_driver(self):
 
         if self.deployment and self.state:
@@ -139,29 +189,9 @@ class LocalComponent():
                       f"deployment "
                   f"{self.deployment}")
 
-            # Using ugly if/elif to ensure the script runs on Python < 3.10
-            if self.deployment == Deployment.RED:
-                if self.state == State.PROCESSING:
-                    self.neopixel_client.update_pixels(self.pixels, self.processing_action_red)
-                elif self.state == State.SUCCESSFUL:
-                    self.neopixel_client.update_pixels(self.pixels, self.successful_action_red)
-                elif self.state == State.FAILED:
-                    self.neopixel_client.update_pixels(self.pixels, self.failed_action_red)
-                elif self.state == State.DISABLED:
-                    self.neopixel_client.update_pixels(self.pixels, self.disabled_action_red)
-                elif self.state == State.ENABLED:
-                    self.neopixel_client.update_pixels(self.pixels, self.enabled_action_red)
-            elif self.deployment == Deployment.GREEN:
-                if self.state == State.PROCESSING:
-                    self.neopixel_client.update_pixels(self.pixels, self.processing_action_green)
-                elif self.state == State.SUCCESSFUL:
-                    self.neopixel_client.update_pixels(self.pixels, self.successful_action_green)
-                elif self.state == State.FAILED:
-                    self.neopixel_client.update_pixels(self.pixels, self.failed_action_green)
-                elif self.state == State.DISABLED:
-                    self.neopixel_client.update_pixels(self.pixels, self.disabled_action_green)
-                elif self.state == State.ENABLED:
-                    self.neopixel_client.update_pixels(self.pixels, self.enabled_action_green)
+            action = self.currentAction()
+            if action is not None:
+                self.neopixel_client.update_pixels(self.pixels, action)
 
     def update(self, aws_component_state:AwsComponentState):
         logging.info(f"Updating component {self.state_id} with deployment {aws_component_state.deployment} and state "
@@ -207,6 +237,18 @@ class LocalComponentStates:
         elif component_id == ComponentIds.region2:
             return self.region2
 
+    @classmethod
+    def fromLayout(cls, neopixel_client, layout: Layout):
+        """ Create a component with default actions for every ComponentId bound in the layout """
+        missing = [component_id.value for component_id in ComponentIds if component_id.value not in layout.components]
+        if missing:
+            raise ValueError(f"Layout: no pixels bound to component(s) {', '.join(missing)}")
+        return cls(**{component_id.value: LocalComponent(
+            neopixel_client = neopixel_client,
+            state_id = component_id,
+            pixels = layout.components[component_id.value],
+        ) for component_id in ComponentIds})
+
     def getAllComponentStates(self):
         return [self.repo, self.build, self.qa, self.transitionRegion1, self.region1, self.transitionRegion2, self.region2]
 
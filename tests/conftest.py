@@ -0,0 +1,4 @@
+import sys
+
+# Modules pick the mock NeoPixel driver and board when "--mock" is the first argument, like `python3 -m src.main --mock`
+sys.argv[1:1] = ["--mock"]
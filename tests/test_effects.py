@@ -0,0 +1,58 @@
+import logging
+
+# Loaded first, like in main.py: types and neopxl import each other
+import src.utils.types  # noqa: F401
+from src.utils.effects import FrameCache, frame_at, register_effect
+from src.utils.types import EffectAction
+
+def solid(value: int) -> EffectAction:
+    return EffectAction.create('solid', color=(value, value, value))
+
+def test_least_recently_used_entries_are_evicted_under_max_bytes():
+    # Every solid frame of 10 pixels takes 30 bytes, so 2 fit
+    cache = FrameCache(max_bytes=60)
+    cache.get(solid(1), 10)
+    cache.get(solid(2), 10)
+    cache.get(solid(3), 10)
+    assert list(cache.entries) == [(solid(2), 10), (solid(3), 10)]
+    assert cache.stats()["bytes"] == 60
+    assert cache.stats()["evictions"] == 1
+
+def test_hit_moves_entry_to_the_end():
+    cache = FrameCache(max_bytes=60)
+    cache.get(solid(1), 10)
+    cache.get(solid(2), 10)
+    frames, fps = cache.get(solid(1), 10)
+    assert frames == (bytes([1, 1, 1]) * 10,) and fps == 0
+    cache.get(solid(3), 10)
+    # solid(1) was used more recently than solid(2), so solid(2) is evicted
+    assert list(cache.entries) == [(solid(1), 10), (solid(3), 10)]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+def test_oversized_effect_is_not_cached_and_warned_about_once(caplog):
+    cache = FrameCache(max_bytes=20)
+    with caplog.at_level(logging.WARNING):
+        for _ in range(3):
+            frames, _ = cache.get(solid(1), 10)
+            assert frames == (bytes([1, 1, 1]) * 10,)
+    assert len(caplog.records) == 1
+    assert not cache.entries
+    assert cache.stats()["bytes"] == 0
+    assert cache.stats()["oversized"] == 3
+
+def test_frame_at_picks_frame_by_fps_and_timestamp():
+    @register_effect('test_counter', fps=4)
+    def _counter(length):
+        return [bytes([index]) * 3 * length for index in range(5)]
+
+    frames, fps = FrameCache(max_bytes=1024).get(EffectAction.create('test_counter'), 1)
+    assert fps == 4
+    # Frame int(timestamp * fps) modulo the 5 frames of the cycle
+    assert frame_at(frames, fps, 0.0) == bytes([0, 0, 0])
+    assert frame_at(frames, fps, 0.3) == bytes([1, 1, 1])
+    assert frame_at(frames, fps, 1.0) == bytes([4, 4, 4])
+    assert frame_at(frames, fps, 1.25) == bytes([0, 0, 0])
+    assert frame_at(frames, fps, 1000.6) == bytes([2, 2, 2])
+    # Static effects and single frames always show the first frame
+    assert frame_at(frames, 0, 12.3) == bytes([0, 0, 0])
+    assert frame_at(frames[:1], fps, 12.3) == bytes([0, 0, 0])
@@ -0,0 +1,70 @@
+import json
+import os
+
+import pytest
+
+# Loaded first, like in main.py: types and neopxl import each other
+import src.utils.types  # noqa: F401
+from src.interfaces.neopxl import NeopixelInterface
+from src.utils.layout import PixelMap, load_layout
+
+EXAMPLE_LAYOUT = os.path.join(os.path.dirname(__file__), "..", "src", "utils", "layout.example.json")
+
+def logical_frame(length: int) -> bytes:
+    """ Frame with a distinct (r, g, b) per logical pixel: (i, 100 + i, 200 + i) """
+    return bytes(value for i in range(length) for value in (i, 100 + i, 200 + i))
+
+def render(component_id: str):
+    """ Show a logical frame on one component of the example layout, returns the bytes each mock stripe received """
+    layout = load_layout(EXAMPLE_LAYOUT)
+    neopixel_client = NeopixelInterface(layout.strips)
+    pixels = layout.components[component_id]
+    pixels.write(neopixel_client.framebuffer, logical_frame(len(pixels)))
+    neopixel_client.show_changes()
+    return {output.strip.name: bytes(output.neopixel_client.buf) for output in neopixel_client.outputs}
+
+def wire_pixel(buf: bytes, index: int, pixel_order: str) -> tuple:
+    """ (r, g, b) of a pixel as sent on the wire in pixel_order """
+    pixel = buf[index * 3:index * 3 + 3]
+    return tuple(pixel[pixel_order.index(color)] for color in "RGB")
+
+def test_reversed_segment_on_grb_strip():
+    bufs = render("build")
+    # build: pixels 12 - 23 of the GRB "pipeline" strip, reversed
+    received = [wire_pixel(bufs["pipeline"], 12 + position, "GRB") for position in range(12)]
+    assert received == [(i, 100 + i, 200 + i) for i in [11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1, 0]]
+    # G, R, B on the wire
+    assert bufs["pipeline"][36:39] == bytes([111, 11, 211])
+    assert bufs["pipeline"][:36] == bytes(36)
+    assert bufs["regions"] == bytes(32 * 3)
+
+def test_serpentine_segment_on_rgb_strip():
+    bufs = render("region1")
+    # region1: pixels 4 - 15 of the RGB "regions" strip, rows of 4 with every second row reversed
+    received = [wire_pixel(bufs["regions"], 4 + position, "RGB") for position in range(12)]
+    assert received == [(i, 100 + i, 200 + i) for i in [0, 1, 2, 3, 7, 6, 5, 4, 8, 9, 10, 11]]
+    assert bufs["regions"][12:15] == bytes([0, 100, 200])
+    assert bufs["pipeline"] == bytes(36 * 3)
+
+def test_pixel_map_from_indices_splits_runs():
+    pixel_map = PixelMap.from_indices([0, 1, 2, 5, 6, 3])
+    assert [run[:4] for run in pixel_map.runs] == [(0, 9, 0, 9), (15, 21, 9, 15), (9, 12, 15, 18)]
+    framebuffer = bytearray(7 * 3)
+    pixel_map.write(framebuffer, logical_frame(6))
+    assert framebuffer == bytes([0, 100, 200, 1, 101, 201, 2, 102, 202, 5, 105, 205,
+                                 0, 0, 0, 3, 103, 203, 4, 104, 204])
+
+def write_layout(tmp_path, strips) -> str:
+    filepath = os.path.join(tmp_path, "layout.json")
+    with open(filepath, "w", encoding="utf-8") as file:
+        json.dump({"strips": strips, "segments": {}, "components": {}}, file)
+    return filepath
+
+def test_unsupported_pixel_order_is_rejected(tmp_path):
+    filepath = write_layout(tmp_path, [{"name": "main", "port": "D18", "pixels": 10, "pixel_order": "GRBW"}])
+    with pytest.raises(ValueError, match="pixel_order"):
+        load_layout(filepath)
+
+def test_strips_beyond_driver_limit_are_rejected():
+    with pytest.raises(ValueError, match="supports 1"):
+        load_layout(EXAMPLE_LAYOUT, max_strips=1)